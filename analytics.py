@@ -5,17 +5,39 @@
 # and for querying analytics data to be served by the API.
 # ==============================================================================
 
-import json
+import logging
+from datetime import datetime
+from threading import Lock
+from cachetools import TTLCache, cached
 from flask import jsonify
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, insert, select, update
 
 # --- Import shared extensions and models ---
 from models import db, User, SessionUsage, FeedbackSummary
 
+logger = logging.getLogger(__name__)
+
+# The four IELTS speaking criteria, in the order they are reported.
+_CRITERIA = ('fluency_coherence', 'lexical_resource', 'grammatical_range_accuracy', 'pronunciation')
+_REQUIRED_FIELDS = ('criteria_scores', 'overall_band', 'actionable_insights')
+_NUMERIC_TYPES = (int, float)
+
+def _score_columns(band_scores):
+    """Maps a complete band_scores dict onto the typed FeedbackSummary score columns."""
+    columns = {criterion: band_scores.get(criterion) for criterion in _CRITERIA}
+    columns['overall_score'] = (band_scores.get('overall_band') or {}).get('score')
+    return columns
+
 # ==============================================================================
 # --- Data Logging Logic ---
 # ==============================================================================
 
+def _parse_iso_timestamp(value):
+    """Parses an ISO 8601 timestamp, accepting the 'Z' UTC suffix browsers send."""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
 def calculate_session_metrics(transcript, start_time=None, end_time=None):
     """
     Calculate session metrics from transcript and timing data.
@@ -38,14 +60,13 @@ def calculate_session_metrics(transcript, start_time=None, end_time=None):
     duration = 0
     if start_time and end_time:
         try:
-            from datetime import datetime
             if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                start_time = _parse_iso_timestamp(start_time)
             if isinstance(end_time, str):
-                end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+                end_time = _parse_iso_timestamp(end_time)
             duration = (end_time - start_time).total_seconds()
         except Exception as e:
-            print(f"Error calculating duration: {e}")
+            logger.warning("Error calculating duration: %s", e)
             duration = 0
 
     # Calculate words per minute
@@ -74,29 +95,32 @@ def validate_analysis_data(analysis_data):
         return False, "Analysis data must be a dictionary"
 
     # Check for required fields
-    required_fields = ['criteria_scores', 'overall_band', 'actionable_insights']
-    for field in required_fields:
+    for field in _REQUIRED_FIELDS:
         if field not in analysis_data:
             return False, f"Missing required field: {field}"
 
-    # Validate criteria scores
-    criteria_scores = analysis_data.get('criteria_scores', {})
-    expected_criteria = ['fluency_coherence', 'lexical_resource', 'grammatical_range_accuracy', 'pronunciation']
-    for criterion in expected_criteria:
-        if criterion not in criteria_scores:
+    criteria_scores = analysis_data['criteria_scores']
+    if not isinstance(criteria_scores, dict):
+        return False, "criteria_scores must be an object"
+    overall_band = analysis_data['overall_band']
+    if not isinstance(overall_band, dict):
+        return False, "overall_band must be an object"
+
+    # Validate criteria scores with one dict lookup per criterion
+    get_score = criteria_scores.get
+    numeric = _NUMERIC_TYPES
+    for criterion in _CRITERIA:
+        score = get_score(criterion)
+        if score is None:
             return False, f"Missing criterion score: {criterion}"
-
-        score = criteria_scores[criterion]
-        if not isinstance(score, (int, float)) or score < 0 or score > 9:
+        if type(score) not in numeric or not 0 <= score <= 9:
             return False, f"Invalid score for {criterion}: must be a number between 0 and 9"
 
     # Validate overall band
-    overall_band = analysis_data.get('overall_band', {})
-    if 'score' not in overall_band:
+    overall_score = overall_band.get('score')
+    if overall_score is None:
         return False, "Missing overall band score"
-
-    overall_score = overall_band['score']
-    if not isinstance(overall_score, (int, float)) or overall_score < 0 or overall_score > 9:
+    if type(overall_score) not in numeric or not 0 <= overall_score <= 9:
         return False, "Invalid overall band score: must be a number between 0 and 9"
 
     return True, None
@@ -120,7 +144,7 @@ def log_session(user_id, session_id_str, analysis_data, duration=None, transcrip
         # Validate analysis data structure
         is_valid, error_message = validate_analysis_data(analysis_data)
         if not is_valid:
-            print(f"ANALYTICS_ERROR: Invalid analysis data - {error_message}")
+            logger.error("ANALYTICS_ERROR: Invalid analysis data - %s", error_message)
             return False
 
         # Calculate session metrics
@@ -161,27 +185,165 @@ def log_session(user_id, session_id_str, analysis_data, duration=None, transcrip
         feedback_summary = FeedbackSummary(
             # The 'session' backref links this to new_session_usage automatically
             session=new_session_usage,
-            # Use json.dumps to convert Python dicts into JSON strings for DB storage
-            band_scores=json.dumps(complete_band_scores),
-            feedback_text=json.dumps(comprehensive_feedback)
+            # JSON columns: the dicts are stored as-is, no manual serialization
+            band_scores=complete_band_scores,
+            feedback_text=comprehensive_feedback,
+            **_score_columns(complete_band_scores)
         )
 
         db.session.add(new_session_usage)
         db.session.add(feedback_summary)
         db.session.commit()
 
-        print(f"ANALYTICS: Successfully logged session '{session_id_str}' for user '{user_id}'. "
-              f"Duration: {session_duration}s, Words: {words_spoken}")
-        print(f"ANALYTICS: Transcript length: {len(transcript) if transcript else 0} characters")
-        print(f"ANALYTICS: Questions and answers count: {len(questions_and_answers) if questions_and_answers else 0}")
-        print(f"ANALYTICS: Analysis data keys: {list(analysis_data.keys()) if analysis_data else 'None'}")
+        # Lazy %-formatting: nothing is interpolated unless DEBUG is enabled
+        logger.debug("ANALYTICS: Successfully logged session '%s' for user '%s'. Duration: %ss, Words: %s",
+                     session_id_str, user_id, session_duration, words_spoken)
+        logger.debug("ANALYTICS: Transcript length: %d characters", len(transcript) if transcript else 0)
+        logger.debug("ANALYTICS: Questions and answers count: %d", len(questions_and_answers) if questions_and_answers else 0)
+        logger.debug("ANALYTICS: Analysis data keys: %s", analysis_data.keys())
         return new_session_usage.id  # Return the session usage ID for reference
 
     except Exception as e:
         db.session.rollback()
-        print(f"ANALYTICS_ERROR: Failed to log session. Rolled back transaction. Error: {e}")
+        logger.error("ANALYTICS_ERROR: Failed to log session. Rolled back transaction. Error: %s", e)
         return False
 
+def log_sessions_bulk(records):
+    """
+    Saves many sessions at once. Each record is a dict with the SessionUsage
+    fields (user_id, session_id_str, duration, words_spoken and optionally date)
+    plus 'band_scores' and 'feedback_text' dicts for the FeedbackSummary.
+    Both tables are written with one executemany INSERT each instead of one
+    ORM flush per row. Used by the seeder and any batch import.
+
+    Args:
+        records: List of session record dicts
+
+    Returns:
+        list: The new SessionUsage IDs, in the same order as records
+    """
+    if not records:
+        return []
+
+    try:
+        now = datetime.utcnow()
+        session_rows = [
+            {
+                "user_id": record["user_id"],
+                "session_id_str": record["session_id_str"],
+                "duration": record["duration"],
+                "words_spoken": record.get("words_spoken"),
+                "date": record.get("date") or now
+            }
+            for record in records
+        ]
+        session_ids = db.session.execute(
+            insert(SessionUsage).returning(SessionUsage.id, sort_by_parameter_order=True),
+            session_rows
+        ).scalars().all()
+
+        feedback_rows = [
+            {
+                "session_usage_id": session_id,
+                "band_scores": record["band_scores"],
+                "feedback_text": record.get("feedback_text", {}),
+                **_score_columns(record["band_scores"])
+            }
+            for session_id, record in zip(session_ids, records)
+        ]
+        db.session.execute(insert(FeedbackSummary), feedback_rows)
+        db.session.commit()
+
+        logger.debug("ANALYTICS: Bulk logged %d sessions", len(session_ids))
+        return session_ids
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error("ANALYTICS_ERROR: Failed to bulk log sessions. Rolled back transaction. Error: %s", e)
+        return False
+
+def backfill_score_columns():
+    """
+    Fills the typed score columns of feedback rows saved before those
+    columns existed, from their band_scores JSON.
+
+    Returns:
+        int: Number of rows updated
+    """
+    legacy_rows = FeedbackSummary.query.with_entities(
+        FeedbackSummary.id, FeedbackSummary.band_scores
+    ).filter(FeedbackSummary.overall_score.is_(None)).all()
+
+    updates = []
+    for feedback_id, band_scores in legacy_rows:
+        try:
+            updates.append({"id": feedback_id, **_score_columns(band_scores)})
+        except AttributeError as e:
+            logger.error("ANALYTICS_ERROR: Could not backfill scores for feedback %s: %s", feedback_id, e)
+
+    if updates:
+        db.session.execute(update(FeedbackSummary), updates)
+        db.session.commit()
+    return len(updates)
+
+# ==============================================================================
+# --- Prepared Queries ---
+# Built once at import time and parameterized per call, so SQLAlchemy reuses
+# the same compiled statement for every request.
+# ==============================================================================
+
+_USER_NAME_STMT = select(User.id, User.username).where(User.id == bindparam('user_id'))
+
+_USER_SESSIONS_STMT = (
+    select(
+        SessionUsage.id,
+        SessionUsage.session_id_str,
+        SessionUsage.date,
+        FeedbackSummary.id.label('feedback_id'),
+        FeedbackSummary.overall_score,
+        *(getattr(FeedbackSummary, criterion) for criterion in _CRITERIA)
+    )
+    .outerjoin(SessionUsage.feedback)
+    .where(SessionUsage.user_id == bindparam('user_id'))
+    .order_by(SessionUsage.date.asc())
+)
+
+_USER_TOTALS_STMT = select(
+    func.count(SessionUsage.id),
+    func.coalesce(func.sum(SessionUsage.duration), 0) # in seconds
+).where(SessionUsage.user_id == bindparam('user_id'))
+
+# All three platform totals as scalar subqueries of a single SELECT
+_PLATFORM_TOTALS_STMT = select(
+    select(func.count(User.id)).scalar_subquery().label('total_users'),
+    select(func.count(SessionUsage.id)).scalar_subquery().label('total_sessions'),
+    select(func.coalesce(func.sum(SessionUsage.duration), 0)).scalar_subquery().label('total_duration')
+)
+
+# COUNT(*) over the grouped column only touches ix_sessionusage_session_id_str,
+# so the database can answer from the index without reading table rows.
+_popular_count = func.count().label('count')
+_POPULAR_SESSIONS_STMT = (
+    select(SessionUsage.session_id_str, _popular_count)
+    .group_by(SessionUsage.session_id_str)
+    .order_by(_popular_count.desc())
+    .limit(5)
+)
+
+_SESSION_DETAIL_STMT = (
+    select(
+        SessionUsage.id,
+        SessionUsage.session_id_str,
+        SessionUsage.date,
+        SessionUsage.duration,
+        SessionUsage.words_spoken,
+        FeedbackSummary.band_scores,
+        FeedbackSummary.feedback_text
+    )
+    .join(SessionUsage.feedback)
+    .where(SessionUsage.id == bindparam('session_usage_id'))
+)
+
 # ==============================================================================
 # --- Analytics API Logic ---
 # ==============================================================================
@@ -190,30 +352,33 @@ def get_user_analytics(user_id):
     """
     Fetches all session history and progress data for a specific user.
     """
-    user = User.query.get(user_id)
+    params = {'user_id': user_id}
+    user = db.session.execute(_USER_NAME_STMT, params).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    # Query all sessions for the user, ordered by date
-    sessions = SessionUsage.query.filter_by(user_id=user_id).order_by(SessionUsage.date.asc()).all()
-    
+    # Query all sessions for the user, ordered by date. The scores come from
+    # the typed feedback columns, so no JSON is parsed here.
+    sessions = db.session.execute(_USER_SESSIONS_STMT, params).all()
+
     # Format the data for the frontend
     progress_data = []
     for session in sessions:
-        feedback = session.feedback
-        band_scores = json.loads(feedback.band_scores) if feedback else {}
-        
+        scores = {}
+        if session.feedback_id is not None:
+            scores = {criterion: getattr(session, criterion) for criterion in _CRITERIA}
+            scores['overall_band'] = {"score": session.overall_score}
+
         progress_data.append({
             "session_usage_id": session.id,
             "session_id_str": session.session_id_str,
             "date": session.date.isoformat(),
-            "overall_score": band_scores.get('overall_band', {}).get('score'), # Example of drilling down
-            "scores": band_scores
+            "overall_score": session.overall_score,
+            "scores": scores
         })
 
-    # Calculate summary stats
-    total_sessions = len(sessions)
-    total_practice_time = sum(s.duration for s in sessions) # in seconds
+    # Calculate summary stats in the database instead of looping over rows
+    total_sessions, total_practice_time = db.session.execute(_USER_TOTALS_STMT, params).one()
 
     return jsonify({
         "user_id": user.id,
@@ -224,53 +389,57 @@ def get_user_analytics(user_id):
     })
 
 
-def get_platform_summary():
-    """
-    Calculates and returns platform-wide statistics.
-    """
-    total_users = db.session.query(func.count(User.id)).scalar()
-    total_sessions_run = db.session.query(func.count(SessionUsage.id)).scalar()
-    total_hours_practiced = db.session.query(func.sum(SessionUsage.duration)).scalar() or 0
-    total_hours_practiced /= 3600 # Convert seconds to hours
+# Platform-wide stats change slowly, so they are computed at most once per TTL
+# window and served from memory in between.
+@cached(TTLCache(maxsize=1, ttl=30), lock=Lock())
+def _platform_summary_data():
+    totals = db.session.execute(_PLATFORM_TOTALS_STMT).one()
+    total_hours_practiced = totals.total_duration / 3600 # Convert seconds to hours
 
-    return jsonify({
-        "total_users": total_users,
-        "total_sessions_run": total_sessions_run,
+    return {
+        "total_users": totals.total_users,
+        "total_sessions_run": totals.total_sessions,
         "total_hours_practiced": round(total_hours_practiced, 2)
-    })
+    }
 
-def get_popular_sessions():
+def get_platform_summary():
     """
-    Finds and returns the most frequently practiced sessions.
+    Calculates and returns platform-wide statistics.
     """
-    popular_sessions_query = db.session.query(
-        SessionUsage.session_id_str,
-        func.count(SessionUsage.session_id_str).label('count')
-    ).group_by(SessionUsage.session_id_str).order_by(func.count(SessionUsage.session_id_str).desc()).limit(5).all()
+    return jsonify(_platform_summary_data())
+
+# The top sessions shift even more slowly than the totals, so keep them longer
+@cached(TTLCache(maxsize=1, ttl=60), lock=Lock())
+def _popular_sessions_data():
+    popular_sessions_query = db.session.execute(_POPULAR_SESSIONS_STMT).all()
 
     popular_sessions = [
         {"session_id": session_id, "times_practiced": count}
         for session_id, count in popular_sessions_query
     ]
 
-    return jsonify(popular_sessions)
+    return popular_sessions
+
+def get_popular_sessions():
+    """
+    Finds and returns the most frequently practiced sessions.
+    """
+    return jsonify(_popular_sessions_data())
 
 
 def get_session_analytics_data(session_usage_id):
     """
     Helper function to get session analytics data as a Python dict (for internal use)
     """
-    session_usage = SessionUsage.query.get(session_usage_id)
+    # Fetch the session and its feedback as one joined row of plain columns
+    session_usage = db.session.execute(_SESSION_DETAIL_STMT, {'session_usage_id': session_usage_id}).first()
     if not session_usage:
         return None
 
-    feedback = session_usage.feedback
-    if not feedback:
-        return None
-
     try:
-        band_scores = json.loads(feedback.band_scores)
-        feedback_data = json.loads(feedback.feedback_text)
+        # JSON columns come back from the driver as Python dicts already
+        band_scores = session_usage.band_scores
+        feedback_data = session_usage.feedback_text
 
         # Extract data with fallbacks for older records
         actionable_insights = feedback_data.get('actionable_insights', feedback_data) if isinstance(feedback_data, dict) else {}
@@ -296,8 +465,8 @@ def get_session_analytics_data(session_usage_id):
             "questions_and_answers": questions_and_answers,
             "original_transcript": original_transcript
         }
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"Error getting session analytics data: {e}")
+    except Exception as e:
+        logger.error("Error getting session analytics data: %s", e)
         return None
 
 def get_session_analytics(session_usage_id):
@@ -6,12 +6,75 @@
 # ==============================================================================
 
 import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import jwt
+from cachetools import TTLCache
 from flask import request, jsonify, current_app
+from sqlalchemy import or_, update
+from sqlalchemy.orm import load_only
 
 # --- Import shared extensions and models ---
 # This is the key change: we no longer define User or db here.
-from models import db, bcrypt, User
+from models import db, User, hash_password
+
+logger = logging.getLogger(__name__)
+
+# Columns rendered by User.to_json(); profile endpoints never need the password hash.
+_PROFILE_COLUMNS = (User.id, User.username, User.email, User.last_login, User.created_at)
+
+# Post-login bookkeeping runs here so the token is returned without waiting on it.
+BACKGROUND_WORKERS = 2
+_background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='auth-background')
+
+# User IDs recently confirmed to exist, so login_required skips the lookup.
+# Only hits are cached; entries are dropped on account deletion.
+_known_users = TTLCache(maxsize=10_000, ttl=60)
+_known_users_lock = Lock()
+
+
+def user_exists(user_id):
+    """
+    Checks that a user ID from a valid token still belongs to an account.
+
+    Args:
+        user_id: ID of the user
+
+    Returns:
+        bool: True if the user exists
+    """
+    with _known_users_lock:
+        if user_id in _known_users:
+            return True
+
+    exists = db.session.query(User.id).filter_by(id=user_id).scalar() is not None
+    if exists:
+        with _known_users_lock:
+            _known_users[user_id] = True
+    return exists
+
+
+def _record_login(app, user_id, login_time, rehash_password=None, old_hash=None):
+    """
+    Stores last_login and, if one is needed, a rehashed password in one
+    transaction. Runs on the background executor with its own app context.
+    The rehash only applies while the stored hash is still old_hash, so a
+    password change that lands first is never overwritten.
+    """
+    with app.app_context():
+        try:
+            db.session.execute(update(User).where(User.id == user_id).values(last_login=login_time))
+            if rehash_password is not None:
+                db.session.execute(
+                    update(User)
+                    .where(User.id == user_id, User.password_hash == old_hash)
+                    .values(password_hash=hash_password(rehash_password))
+                )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Failed to record login for user %s: %s", user_id, e)
 
 # ==============================================================================
 # --- Authentication Routes ---
@@ -31,9 +94,13 @@ def register_user():
     email = data.get('email')
     password = data.get('password')
 
-    if User.query.filter_by(username=username).first() is not None:
-        return jsonify({"error": "Username already exists"}), 409
-    if User.query.filter_by(email=email).first() is not None:
+    # Check username and email uniqueness in a single query
+    existing = User.query.with_entities(User.username, User.email).filter(
+        or_(User.username == username, User.email == email)
+    ).first()
+    if existing is not None:
+        if existing.username == username:
+            return jsonify({"error": "Username already exists"}), 409
         return jsonify({"error": "Email address already registered"}), 409
 
     new_user = User(username=username, email=email, password=password)
@@ -58,22 +125,35 @@ def login_user():
     user = User.query.filter_by(email=email).first()
 
     if user and user.check_password(password):
-        user.last_login = datetime.datetime.utcnow()
-        db.session.commit()
+        login_time = datetime.datetime.utcnow()
+
+        # Record the login off the request path. Older hashes are transparently
+        # moved to the configured cost factor in the same transaction.
+        rehash = user.needs_rehash()
+        _background.submit(
+            _record_login,
+            current_app._get_current_object(),
+            user.id,
+            login_time,
+            password if rehash else None,
+            user.password_hash if rehash else None
+        )
 
         # Create a proper JWT token
-        from flask import current_app
         payload = {
             'user_id': user.id,
             'email': user.email,
             'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)  # Token expires in 7 days
         }
-        token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+        token = jwt.encode(payload, current_app.extensions['jwt_key'], algorithm='HS256')
+
+        user_json = user.to_json()
+        user_json["last_login"] = login_time.isoformat()
 
         return jsonify({
             "message": "Login successful!",
             "token": token,
-            "user": user.to_json()
+            "user": user_json
         }), 200
     
     return jsonify({"error": "Invalid credentials"}), 401
@@ -84,7 +164,7 @@ def get_current_user(user_id):
     Handles the logic for the /api/me endpoint.
     Fetches the current user's data.
     """
-    user = User.query.get(user_id)
+    user = User.query.options(load_only(*_PROFILE_COLUMNS)).get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -96,7 +176,7 @@ def update_user_profile(user_id):
     Handles the logic for the PUT /api/me endpoint.
     Updates the current user's profile information.
     """
-    user = User.query.get(user_id)
+    user = User.query.options(load_only(*_PROFILE_COLUMNS)).get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -104,30 +184,37 @@ def update_user_profile(user_id):
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
-    # Update username if provided
+    new_username = None
+    new_email = None
+    conflicts = []
+
+    # Validate username if provided
     if 'username' in data:
         new_username = data['username'].strip()
         if not new_username:
             return jsonify({"error": "Username cannot be empty"}), 400
+        conflicts.append(User.username == new_username)
 
-        # Check if username is already taken by another user
-        existing_user = User.query.filter_by(username=new_username).first()
-        if existing_user and existing_user.id != user_id:
-            return jsonify({"error": "Username already exists"}), 409
-
-        user.username = new_username
-
-    # Update email if provided
+    # Validate email if provided
     if 'email' in data:
         new_email = data['email'].strip()
         if not new_email:
             return jsonify({"error": "Email cannot be empty"}), 400
-
-        # Check if email is already taken by another user
-        existing_user = User.query.filter_by(email=new_email).first()
-        if existing_user and existing_user.id != user_id:
+        conflicts.append(User.email == new_email)
+
+    # Check if username or email is already taken by another user in one query
+    if conflicts:
+        existing_user = User.query.with_entities(User.username, User.email).filter(
+            User.id != user_id, or_(*conflicts)
+        ).first()
+        if existing_user is not None:
+            if new_username is not None and existing_user.username == new_username:
+                return jsonify({"error": "Username already exists"}), 409
             return jsonify({"error": "Email already exists"}), 409
 
+    if new_username is not None:
+        user.username = new_username
+    if new_email is not None:
         user.email = new_email
 
     try:
@@ -143,7 +230,7 @@ def update_user_password(user_id):
     Handles the logic for the PUT /api/me/password endpoint.
     Updates the current user's password.
     """
-    user = User.query.get(user_id)
+    user = User.query.options(load_only(User.id, User.password_hash)).get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -163,7 +250,7 @@ def update_user_password(user_id):
         return jsonify({"error": "New password must be at least 6 characters long"}), 400
 
     # Update password
-    user.password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+    user.set_password(new_password)
 
     try:
         db.session.commit()
@@ -178,7 +265,7 @@ def delete_user_account(user_id):
     Handles the logic for the DELETE /api/me endpoint.
     Deletes the current user's account and all associated data.
     """
-    user = User.query.get(user_id)
+    user = User.query.options(load_only(User.id)).get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -186,22 +273,22 @@ def delete_user_account(user_id):
         # Delete all user's session data
         from models import SessionUsage, FeedbackSummary
 
-        # Get all user's sessions
-        user_sessions = SessionUsage.query.filter_by(user_id=user_id).all()
-
-        # Delete feedback summaries for user's sessions
-        for session in user_sessions:
-            feedback = FeedbackSummary.query.filter_by(session_usage_id=session.id).first()
-            if feedback:
-                db.session.delete(feedback)
+        # Delete feedback summaries for user's sessions in one statement
+        user_session_ids = db.session.query(SessionUsage.id).filter_by(user_id=user_id)
+        FeedbackSummary.query.filter(
+            FeedbackSummary.session_usage_id.in_(user_session_ids)
+        ).delete(synchronize_session=False)
 
         # Delete user's sessions
-        SessionUsage.query.filter_by(user_id=user_id).delete()
+        SessionUsage.query.filter_by(user_id=user_id).delete(synchronize_session=False)
 
         # Delete the user
         db.session.delete(user)
         db.session.commit()
 
+        with _known_users_lock:
+            _known_users.pop(user_id, None)
+
         return jsonify({"message": "Account deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
@@ -6,6 +6,7 @@ sys.path.append('.')
 
 from models import db, SessionUsage, FeedbackSummary, User
 from flask import Flask
+from sqlalchemy.orm import selectinload
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///instance/spiko.db'
@@ -24,7 +25,8 @@ with app.app_context():
     print()
     
     # Check session usage records
-    sessions = SessionUsage.query.all()
+    # Load all feedback rows in one extra query instead of one per session
+    sessions = SessionUsage.query.options(selectinload(SessionUsage.feedback)).all()
     print(f"Total SessionUsage records: {len(sessions)}")
     for session in sessions:
         feedback_status = "Yes" if session.feedback else "No"
@@ -7,22 +7,48 @@
 # ==============================================================================
 
 import os
-import json
+import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
+from threading import Lock
 import jwt
-from flask import Flask, request, jsonify, abort
+import orjson
+from cachetools import TTLCache, cached
+from flask import Flask, request, jsonify, abort, send_from_directory, make_response
+from flask.json.provider import DefaultJSONProvider
 from functools import wraps
 from dotenv import load_dotenv
 from flask_cors import CORS
+from sqlalchemy import text
 
-from models import db, bcrypt, User, SessionUsage, FeedbackSummary
-from auth import register_user, login_user, get_current_user, update_user_profile, update_user_password, delete_user_account
-from analytics import log_session, get_user_analytics, get_platform_summary, get_popular_sessions
+from models import db, bcrypt, User, upgrade_schema
+from auth import register_user, login_user, get_current_user, update_user_profile, update_user_password, delete_user_account, user_exists, BACKGROUND_WORKERS
+from analytics import log_session, log_sessions_bulk, backfill_score_columns, get_user_analytics, get_platform_summary, get_popular_sessions, get_session_analytics_data
 from geo_check import geo_bp
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, so every jsonify() call in the app
+    (auth, analytics, sessions) skips the pure-Python stdlib encoder.
+    """
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 load_dotenv()
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 # Allow all origins for development - more permissive CORS
 CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -36,7 +62,23 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///spi
 if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# JSON columns are (de)serialized by the driver; route that through orjson too.
+# The pool holds a connection for every gunicorn request thread plus the auth
+# background workers, so no thread waits on pool_timeout under full load.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'json_serializer': lambda obj: orjson.dumps(obj).decode('utf-8'),
+    'json_deserializer': orjson.loads,
+    'pool_size': int(os.getenv('GUNICORN_THREADS', 16)) + BACKGROUND_WORKERS,
+    'max_overflow': 0
+}
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'spiko-secret-key-for-jwt-tokens-2024')
+# Pre-encoded HS256 key so token signing and verification don't re-read and encode the config
+app.extensions['jwt_key'] = app.config['SECRET_KEY'].encode('utf-8')
+JWT_ALGORITHMS = ['HS256']
+# Tokens without an expiry or a user_id are rejected by PyJWT itself
+JWT_DECODE_OPTIONS = {"require": ["exp", "user_id"]}
+# bcrypt cost factor: each step doubles login/register CPU time (12 is ~4x slower than 10)
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 10))
 
 db.init_app(app)
 bcrypt.init_app(app)
@@ -49,13 +91,13 @@ def seed_database():
     This function runs only once.
     """
     print("Checking if database needs seeding...")
-    if User.query.first() is None:
+    if db.session.query(User.id).first() is None:
         print("Database is empty. Seeding with default data...")
         
         # 1. Create a default user
         default_user = User(username="SpikoUser", email="user@spiko.ai", password="password123")
         db.session.add(default_user)
-        db.session.commit() # Commit to get the user ID
+        db.session.flush() # Flush to get the user ID; committed with the sessions below
         
         # 2. Create sample session data
         today = datetime.datetime.utcnow()
@@ -69,37 +111,64 @@ def seed_database():
             {"session_id_str": "session_1", "date": days_ago(1), "scores": {"fluency_coherence": 7.5, "lexical_resource": 7.5, "grammatical_range_accuracy": 7.0, "pronunciation": 7.5}, "overall_score": 7.5}
         ]
         
+        sample_feedback = {"feedback_summary": [{"type": "good", "message": "Sample feedback."}]}
+        records = []
         for data in mock_sessions_data:
-            session_usage = SessionUsage(
-                user_id=default_user.id,
-                session_id_str=data["session_id_str"],
-                duration=900,
-                words_spoken=150,
-                date=data["date"]
-            )
-            
             # Add overall score to the band_scores object for consistency
             band_scores_with_overall = data["scores"].copy()
             band_scores_with_overall['overall_band'] = {"score": data["overall_score"]}
 
-            feedback = FeedbackSummary(
-                session=session_usage,
-                band_scores=json.dumps(band_scores_with_overall),
-                feedback_text=json.dumps({"feedback_summary": [{"type": "good", "message": "Sample feedback."}]})
-            )
-            db.session.add(session_usage)
-            db.session.add(feedback)
-            
-        db.session.commit()
+            records.append({
+                "user_id": default_user.id,
+                "session_id_str": data["session_id_str"],
+                "duration": 900,
+                "words_spoken": 150,
+                "date": data["date"],
+                "band_scores": band_scores_with_overall,
+                "feedback_text": sample_feedback
+            })
+
+        # Insert all sample sessions and their feedback in two round-trips and
+        # commit them together with the user, so a failed seed leaves nothing behind
+        if log_sessions_bulk(records) is False:
+            raise RuntimeError("Database seeding failed")
         print("Database seeding complete.")
     else:
         print("Database already contains data. Skipping seed.")
 
 
-# Create tables and run the seeder within the application context
-with app.app_context():
-    db.create_all()
-    seed_database()
+# Arbitrary constant identifying init_database() among PostgreSQL advisory locks
+_INIT_DB_LOCK_KEY = 7305481
+
+def init_database():
+    """
+    Creates missing tables, upgrades the schema, backfills derived columns
+    and seeds an empty database. Runs once per deploy instead of on every
+    import: from the gunicorn master before workers fork (gunicorn.conf.py)
+    or by hand with `flask --app flask_app init-db`. On PostgreSQL an advisory
+    lock serializes concurrent runs, so a second instance waits and then
+    finds nothing left to do.
+    """
+    lock_conn = None
+    if db.engine.dialect.name == 'postgresql':
+        lock_conn = db.engine.connect()
+        lock_conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': _INIT_DB_LOCK_KEY})
+
+    try:
+        db.create_all()
+        upgrade_schema()
+        backfill_score_columns()
+        seed_database()
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': _INIT_DB_LOCK_KEY})
+            lock_conn.close()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create, upgrade and seed the database."""
+    init_database()
+    print("Database initialized.")
 
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -108,6 +177,133 @@ OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 AI_MODEL = "mistralai/mistral-7b-instruct:free"
 SESSION_DATA_PATH = os.path.join(os.path.dirname(__file__), 'session-data')
 
+def _http_session(headers=None):
+    """
+    Creates a requests.Session for one upstream host. The session keeps its
+    TCP/TLS connections alive between requests, sized for the gthread pool.
+    Failed connects are retried; POSTs are never re-sent once a request
+    went out, only idempotent calls retry on 502/503/504.
+    """
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retries))
+    if headers:
+        session.headers.update(headers)
+    return session
+
+# The API key lives on this session only, so it is never sent to another host
+_openrouter = _http_session({"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"})
+
+# Static parts of the analysis prompt, built once at import. Only the
+# transcript section in between is formatted per request.
+_ANALYZE_PROMPT_HEAD = """
+    You are an expert, impartial, and highly-trained IELTS Speaking examiner. Your task is to evaluate the given transcript of a candidate's spoken response in an IELTS Speaking test.
+
+    Your evaluation should cover: fluency and coherence, lexical resource, grammatical range and accuracy, and pronunciation.
+
+    For each criterion, assign a band score from 0 to 9 with one decimal place precision.
+
+    CRITICAL INSTRUCTIONS FOR DIVERSE, CONTEXTUAL FEEDBACK:
+    1. Analyze the transcript word by word and identify specific grammar mistakes and vocabulary improvements
+    2. For each issue found, provide the exact word position (counting from 0) in the transcript
+    3. MOST IMPORTANT: Each correction must be UNIQUE and CONTEXTUAL. Never repeat the same correction or reason
+    4. For similar mistakes, provide DIFFERENT explanations, alternative corrections, and varied reasoning
+    5. Consider the specific context, surrounding words, intended meaning, and sentence structure for each error
+    6. Provide diverse vocabulary suggestions that fit the specific context and register
+    7. Vary your explanations - use different grammatical terminology, examples, and teaching approaches
+    8. If you find the same type of error multiple times, address each instance differently with unique solutions
+
+    EXAMPLE OF DIVERSE CORRECTIONS FOR REPEATED MISTAKES:
+    - First "I want" → "I'd like" (Reason: "Use contractions for more natural, conversational flow")
+    - Second "I want" → "I would prefer" (Reason: "Vary your expressions to show lexical range")
+    - Third "I want" → "I'm hoping to" (Reason: "Softer phrasing sounds more polite and sophisticated")
+
+    Split the transcript into words using spaces, then identify issues by their position number.
+
+    Example: For transcript "I am enjoying my work very much"
+    Word positions: 0=I, 1=am, 2=enjoying, 3=my, 4=work, 5=very, 6=much
+
+    Format your response as a JSON object:
+
+    {
+        "criteria_scores": {
+            "fluency_coherence": 6.5,
+            "lexical_resource": 6.0,
+            "grammatical_range_accuracy": 6.0,
+            "pronunciation": 6.5
+        },
+        "overall_band": {
+            "score": 6.2,
+            "summary": "The candidate demonstrates good overall speaking ability with room for improvement in specific areas."
+        },
+        "word_analysis": {
+            "2": {
+                "type": "grammar",
+                "original": "enjoying",
+                "correction": "enjoy",
+                "reason": "After 'am' use base form, not -ing form when expressing general preference"
+            },
+            "4": {
+                "type": "vocabulary",
+                "original": "work",
+                "suggestion": "job",
+                "reason": "More natural word choice in this context"
+            },
+            "8": {
+                "type": "grammar",
+                "original": "enjoying",
+                "correction": "fond of",
+                "reason": "Alternative structure: 'I am fond of' shows variety in expression patterns"
+            },
+            "12": {
+                "type": "vocabulary",
+                "original": "work",
+                "suggestion": "profession",
+                "reason": "Elevates register and demonstrates sophisticated vocabulary range"
+            }
+        },
+        "actionable_insights": {
+            "feedback_summary": [
+                {
+                    "type": "good",
+                    "message": "You spoke clearly and maintained good fluency throughout the response."
+                },
+                {
+                    "type": "warn",
+                    "message": "Pay attention to verb forms after auxiliary verbs."
+                },
+                {
+                    "type": "critique",
+                    "message": "Try to use more varied and sophisticated vocabulary to improve your lexical resource score."
+                }
+            ]
+        }
+    }
+
+"""
+_ANALYZE_PROMPT_TAIL = """
+
+    FINAL REMINDER: Provide DIVERSE, UNIQUE corrections for each error. Never repeat the same correction or reasoning. Each mistake should receive individual, contextual attention with varied explanations and different solution approaches. Focus on finding at least 2-3 grammar or vocabulary improvements if the text is longer than 20 words.
+    """
+
+# Static guidelines block of the session chat prompt
+_CHAT_PROMPT_GUIDELINES = """
+    GUIDELINES:
+    - Be encouraging but honest about areas for improvement
+    - Reference specific examples from their performance when possible
+    - Provide actionable, practical advice
+    - Keep responses concise (2-3 paragraphs max)
+    - Use a friendly, professional tone
+"""
+
+# The analyze request body, JSON-encoded once at import and split where the
+# per-request transcript section goes, so only that section is escaped per call
+_ANALYZE_BODY_HEAD, _ANALYZE_BODY_TAIL = orjson.dumps({
+    "model": AI_MODEL,
+    "messages": [{"role": "user", "content": _ANALYZE_PROMPT_HEAD + "\0" + _ANALYZE_PROMPT_TAIL}],
+    "stream": True
+}).split(b"\\u0000")
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -116,21 +312,19 @@ def login_required(f):
         if not auth_header or not auth_header.startswith('Bearer '):
             return jsonify({"error": "Missing or invalid authorization header"}), 401
 
-        # Extract the token
-        token = auth_header.split(' ')[1]
+        # Extract the token (everything after "Bearer ")
+        token = auth_header[7:]
 
         try:
             # Decode the JWT token to get the user_id
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            payload = jwt.decode(token, app.extensions['jwt_key'], algorithms=JWT_ALGORITHMS, options=JWT_DECODE_OPTIONS)
             user_id = payload.get('user_id')
 
             if not user_id:
                 return jsonify({"error": "Invalid token payload"}), 401
 
-            # Verify the user exists
-            from models import User
-            user = User.query.get(user_id)
-            if not user:
+            # Verify the user exists (cached briefly per user ID)
+            if not user_exists(user_id):
                 return jsonify({"error": "User not found"}), 401
 
             # Pass the actual user_id to the decorated function
@@ -142,11 +336,27 @@ def login_required(f):
         except jwt.InvalidTokenError:
             return jsonify({"error": "Invalid token"}), 401
         except Exception as e:
-            print(f"Token validation error: {e}")
+            logger.error("Token validation error: %s", e)
             return jsonify({"error": "Token validation failed"}), 401
 
     return decorated_function
 
+def cache_control(max_age):
+    """
+    Lets browsers and shared caches (CDN/edge) reuse successful responses of
+    a public, user-independent GET endpoint for max_age seconds, and serve a
+    stale copy for another minute while they revalidate.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.headers['Cache-Control'] = f'public, max-age={max_age}, stale-while-revalidate=60'
+            return response
+        return decorated_function
+    return decorator
+
 # --- API Endpoints ---
 
 @app.route('/api/register', methods=['POST'])
@@ -171,35 +381,87 @@ def handle_update_password(user_id): return update_user_password(user_id)
 @login_required
 def handle_delete_account(user_id): return delete_user_account(user_id)
 
-@app.route('/api/sessions', methods=['GET'])
-def get_all_sessions():
-    sessions = []
-    if not os.path.exists(SESSION_DATA_PATH): return jsonify({"error": "Server configuration error"}), 500
+# --- Session Data ---
+# The session files are static, so they are read once at startup and served
+# from memory instead of re-reading the directory on every request.
+_SESSIONS_INDEX = None # [{id, title, keywords}] for /api/sessions, None if loading failed
+_SESSIONS_BY_ID = {}   # Full session dicts keyed by file name without .json
+
+def _load_sessions():
+    global _SESSIONS_INDEX
+    index = []
     try:
-        for filename in os.listdir(SESSION_DATA_PATH):
-            if filename.endswith('.json'):
-                filepath = os.path.join(SESSION_DATA_PATH, filename)
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    sessions.append({ "id": data.get("session_id"), "title": data.get("title"), "keywords": data.get("keywords") })
+        with os.scandir(SESSION_DATA_PATH) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    with open(entry.path, 'rb') as f:
+                        data = orjson.loads(f.read())
+                    index.append({ "id": data.get("session_id"), "title": data.get("title"), "keywords": data.get("keywords") })
+                    _SESSIONS_BY_ID[entry.name[:-len('.json')]] = data
     except Exception as e:
         print(f"ERROR reading session files: {e}")
-        return jsonify({"error": "Server error"}), 500
-    return jsonify(sessions)
+        return
+    _SESSIONS_INDEX = index
+
+_load_sessions()
+
+@app.route('/api/sessions', methods=['GET'])
+@cache_control(300)
+def get_all_sessions():
+    if _SESSIONS_INDEX is None: return jsonify({"error": "Server configuration error"}), 500
+    return jsonify(_SESSIONS_INDEX)
 
 @app.route('/api/sessions/<session_id>', methods=['GET'])
+@cache_control(300)
 def get_single_session(session_id):
-    filepath = os.path.join(SESSION_DATA_PATH, f"{session_id}.json")
-    if not os.path.exists(filepath): return jsonify({"error": "Session not found"}), 404
-    try:
-        with open(filepath, 'r') as f: return jsonify(json.load(f))
-    except Exception: return jsonify({"error": "Could not read session file"}), 500
+    session = _SESSIONS_BY_ID.get(session_id)
+    if session is None: return jsonify({"error": "Session not found"}), 404
+    return jsonify(session)
+
+def _stream_completion(body, timeout):
+    """
+    Calls OpenRouter with streaming enabled and returns the full completion
+    text. The response is read as server-sent events and only the content
+    deltas are kept, so the raw response body is never buffered whole.
+
+    Args:
+        body: JSON-encoded chat completion request with "stream": true
+        timeout: Seconds to wait for the connection and between chunks
+
+    Returns:
+        str: The concatenated completion text
+    """
+    parts = []
+    with _openrouter.post(
+        url=OPENROUTER_API_URL,
+        data=body,
+        timeout=timeout,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            # Blank keep-alives and ": OPENROUTER PROCESSING" comments carry no data
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
+                break
+            chunk = orjson.loads(data)
+            if 'error' in chunk:
+                raise requests.exceptions.RequestException(f"OpenRouter stream error: {chunk['error']}")
+            # Some events, like the final usage-only one, carry no choices
+            choices = chunk.get('choices')
+            if not choices:
+                continue
+            content = choices[0].get('delta', {}).get('content')
+            if content:
+                parts.append(content)
+    return "".join(parts)
 
 @app.route('/api/analyze', methods=['POST'])
 @login_required
 def analyze_speech(user_id):
     data = request.get_json()
-    print(f"ANALYZE_SPEECH: Received data keys: {list(data.keys()) if data else 'None'}")
 
     if not data or 'transcript' not in data: return jsonify({"error": "Missing transcript"}), 400
 
@@ -207,134 +469,37 @@ def analyze_speech(user_id):
     session_id_str = data.get('session_id', 'unknown_session')
     questions_and_answers = data.get('questions_and_answers', [])
 
-    print(f"ANALYZE_SPEECH: Transcript length: {len(transcript)} characters")
-    print(f"ANALYZE_SPEECH: Session ID: {session_id_str}")
-    print(f"ANALYZE_SPEECH: Questions and answers count: {len(questions_and_answers)}")
-    print(f"ANALYZE_SPEECH: Transcript preview: {transcript[:200]}...")
+    logger.debug("ANALYZE_SPEECH: session=%s transcript_len=%d qa_count=%d",
+                 session_id_str, len(transcript), len(questions_and_answers))
 
     if not transcript.strip(): return jsonify({"error": "Transcript cannot be empty."}), 400
 
-    prompt = f"""
-    You are an expert, impartial, and highly-trained IELTS Speaking examiner. Your task is to evaluate the given transcript of a candidate's spoken response in an IELTS Speaking test.
-
-    Your evaluation should cover: fluency and coherence, lexical resource, grammatical range and accuracy, and pronunciation.
-
-    For each criterion, assign a band score from 0 to 9 with one decimal place precision.
-
-    CRITICAL INSTRUCTIONS FOR DIVERSE, CONTEXTUAL FEEDBACK:
-    1. Analyze the transcript word by word and identify specific grammar mistakes and vocabulary improvements
-    2. For each issue found, provide the exact word position (counting from 0) in the transcript
-    3. MOST IMPORTANT: Each correction must be UNIQUE and CONTEXTUAL. Never repeat the same correction or reason
-    4. For similar mistakes, provide DIFFERENT explanations, alternative corrections, and varied reasoning
-    5. Consider the specific context, surrounding words, intended meaning, and sentence structure for each error
-    6. Provide diverse vocabulary suggestions that fit the specific context and register
-    7. Vary your explanations - use different grammatical terminology, examples, and teaching approaches
-    8. If you find the same type of error multiple times, address each instance differently with unique solutions
-
-    EXAMPLE OF DIVERSE CORRECTIONS FOR REPEATED MISTAKES:
-    - First "I want" → "I'd like" (Reason: "Use contractions for more natural, conversational flow")
-    - Second "I want" → "I would prefer" (Reason: "Vary your expressions to show lexical range")
-    - Third "I want" → "I'm hoping to" (Reason: "Softer phrasing sounds more polite and sophisticated")
-
-    Split the transcript into words using spaces, then identify issues by their position number.
-
-    Example: For transcript "I am enjoying my work very much"
-    Word positions: 0=I, 1=am, 2=enjoying, 3=my, 4=work, 5=very, 6=much
-
-    Format your response as a JSON object:
-
-    {{
-        "criteria_scores": {{
-            "fluency_coherence": 6.5,
-            "lexical_resource": 6.0,
-            "grammatical_range_accuracy": 6.0,
-            "pronunciation": 6.5
-        }},
-        "overall_band": {{
-            "score": 6.2,
-            "summary": "The candidate demonstrates good overall speaking ability with room for improvement in specific areas."
-        }},
-        "word_analysis": {{
-            "2": {{
-                "type": "grammar",
-                "original": "enjoying",
-                "correction": "enjoy",
-                "reason": "After 'am' use base form, not -ing form when expressing general preference"
-            }},
-            "4": {{
-                "type": "vocabulary",
-                "original": "work",
-                "suggestion": "job",
-                "reason": "More natural word choice in this context"
-            }},
-            "8": {{
-                "type": "grammar",
-                "original": "enjoying",
-                "correction": "fond of",
-                "reason": "Alternative structure: 'I am fond of' shows variety in expression patterns"
-            }},
-            "12": {{
-                "type": "vocabulary",
-                "original": "work",
-                "suggestion": "profession",
-                "reason": "Elevates register and demonstrates sophisticated vocabulary range"
-            }}
-        }},
-        "actionable_insights": {{
-            "feedback_summary": [
-                {{
-                    "type": "good",
-                    "message": "You spoke clearly and maintained good fluency throughout the response."
-                }},
-                {{
-                    "type": "warn",
-                    "message": "Pay attention to verb forms after auxiliary verbs."
-                }},
-                {{
-                    "type": "critique",
-                    "message": "Try to use more varied and sophisticated vocabulary to improve your lexical resource score."
-                }}
-            ]
-        }}
-    }}
-
-    Transcript to analyze (length: {len(transcript)} characters):
-    \"\"\"{transcript}\"\"\"
-
-    FINAL REMINDER: Provide DIVERSE, UNIQUE corrections for each error. Never repeat the same correction or reasoning. Each mistake should receive individual, contextual attention with varied explanations and different solution approaches. Focus on finding at least 2-3 grammar or vocabulary improvements if the text is longer than 20 words.
-    """
+    transcript_section = f'    Transcript to analyze (length: {len(transcript)} characters):\n    """{transcript}"""'
+    body = b"".join((_ANALYZE_BODY_HEAD, orjson.dumps(transcript_section)[1:-1], _ANALYZE_BODY_TAIL))
     
+    # Give the connection used by login_required back to the pool; the
+    # completion can take up to 90s and log_session checks out a fresh one
+    db.session.close()
+
     try:
-        response = requests.post(
-            url=OPENROUTER_API_URL,
-            headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"},
-            json={"model": AI_MODEL, "messages": [{"role": "user", "content": prompt}]},
-            timeout=90
-        )
-        response.raise_for_status()
-        
-        raw_response_text = response.json()['choices'][0]['message']['content']
-        print(f"AI_RESPONSE: Raw response length: {len(raw_response_text)} characters")
-        print(f"AI_RESPONSE: Response preview: {raw_response_text[:300]}...")
+        raw_response_text = _stream_completion(body, timeout=90)
+        logger.debug("AI_RESPONSE: Raw response length: %d characters", len(raw_response_text))
 
         try:
-            start_index = raw_response_text.find('{')
-            end_index = raw_response_text.rfind('}')
+            # Locate the object in the UTF-8 bytes orjson parses natively, and
+            # hand it a memoryview so the slice isn't copied
+            raw_bytes = raw_response_text.encode('utf-8')
+            start_index = raw_bytes.find(b'{')
+            end_index = raw_bytes.rfind(b'}')
             if start_index == -1 or end_index == -1:
-                raise json.JSONDecodeError("Could not find JSON object in AI response", raw_response_text, 0)
+                raise orjson.JSONDecodeError("Could not find JSON object in AI response", raw_response_text, 0)
 
-            json_str = raw_response_text[start_index:end_index+1]
-            analysis_result = json.loads(json_str)
+            analysis_result = orjson.loads(memoryview(raw_bytes)[start_index:end_index+1])
 
-            print(f"AI_RESPONSE: Successfully parsed JSON with keys: {list(analysis_result.keys())}")
-            if 'word_analysis' in analysis_result:
-                word_analysis = analysis_result['word_analysis']
-                print(f"AI_RESPONSE: Word analysis items: {len(word_analysis)}")
-                for pos, analysis in word_analysis.items():
-                    print(f"AI_RESPONSE: Position {pos}: {analysis['type']} - {analysis['original']}")
+            logger.debug("AI_RESPONSE: Parsed JSON with keys: %s", analysis_result.keys())
 
-        except json.JSONDecodeError as e:
-            print("="*50, "\nFATAL: FAILED TO PARSE AI JSON RESPONSE\n", f"Error: {e}\n", "--- RAW AI RESPONSE ---\n", raw_response_text, "\n", "="*50)
+        except orjson.JSONDecodeError as e:
+            logger.error("FAILED TO PARSE AI JSON RESPONSE: %s\n--- RAW AI RESPONSE ---\n%s", e, raw_response_text)
             raise
 
         session_usage_id = log_session(user_id=user_id, session_id_str=session_id_str, analysis_data=analysis_result, transcript=transcript, questions_and_answers=questions_and_answers)
@@ -346,10 +511,10 @@ def analyze_speech(user_id):
         return jsonify(analysis_result), 200
 
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: API request failed: {e}")
+        logger.error("API request failed: %s", e)
         return jsonify({"error": "Failed to connect to the AI analysis service."}), 503
     except Exception as e:
-        print(f"ERROR: An unknown error occurred during analysis: {e}")
+        logger.exception("An unknown error occurred during analysis: %s", e)
         return jsonify({"error": "An unexpected server error occurred during analysis."}), 500
 
 @app.route('/api/analytics/user/<int:user_id>', methods=['GET'])
@@ -362,6 +527,39 @@ def handle_session_analytics(user_id, session_usage_id):
     from analytics import get_session_analytics
     return get_session_analytics(session_usage_id)
 
+# Rendered chat context per session. A stored analysis never changes, so
+# follow-up questions about the same session skip the DB read and formatting.
+@cached(TTLCache(maxsize=1024, ttl=300), lock=Lock())
+def _chat_context(session_usage_id):
+    """
+    Renders the student's scores and the corrections from a session's
+    analysis, the part of the chat prompt before the guidelines.
+    Raises LookupError for unknown sessions, so misses are never cached.
+    """
+    session_data = get_session_analytics_data(session_usage_id)
+    if not session_data:
+        raise LookupError(session_usage_id)
+
+    scores = session_data.get('criteria_scores', {})
+    corrections = []
+    for analysis in session_data.get('word_analysis', {}).values():
+        get = analysis.get
+        corrections.append(f"- {get('original', '')} → {get('correction', get('suggestion', ''))}: {get('reason', '')}")
+
+    return f"""
+    You are an expert IELTS Speaking tutor. Provide helpful, encouraging advice based on this student's actual performance data.
+
+    STUDENT'S PERFORMANCE:
+    - Overall Band Score: {session_data.get('overall_band', {}).get('score', 'N/A')}
+    - Fluency & Coherence: {scores.get('fluency_coherence', 'N/A')}
+    - Lexical Resource: {scores.get('lexical_resource', 'N/A')}
+    - Grammar & Accuracy: {scores.get('grammatical_range_accuracy', 'N/A')}
+    - Pronunciation: {scores.get('pronunciation', 'N/A')}
+
+    SPECIFIC CORRECTIONS MADE:
+    {chr(10).join(corrections)}
+"""
+
 @app.route('/api/chat/session/<int:session_usage_id>', methods=['POST'])
 @login_required
 def chat_with_session_data(user_id, session_usage_id):
@@ -375,42 +573,24 @@ def chat_with_session_data(user_id, session_usage_id):
     user_message = data.get('message')
 
     # Get the session analytics data for context
-    from analytics import get_session_analytics_data
-    session_data = get_session_analytics_data(session_usage_id)
-
-    if not session_data:
+    try:
+        context = _chat_context(session_usage_id)
+    except LookupError:
         return jsonify({"error": "Session not found"}), 404
 
     # Create contextual prompt for the AI
-    context_prompt = f"""
-    You are an expert IELTS Speaking tutor. Provide helpful, encouraging advice based on this student's actual performance data.
-
-    STUDENT'S PERFORMANCE:
-    - Overall Band Score: {session_data.get('overall_band', {}).get('score', 'N/A')}
-    - Fluency & Coherence: {session_data.get('criteria_scores', {}).get('fluency_coherence', 'N/A')}
-    - Lexical Resource: {session_data.get('criteria_scores', {}).get('lexical_resource', 'N/A')}
-    - Grammar & Accuracy: {session_data.get('criteria_scores', {}).get('grammatical_range_accuracy', 'N/A')}
-    - Pronunciation: {session_data.get('criteria_scores', {}).get('pronunciation', 'N/A')}
-
-    SPECIFIC CORRECTIONS MADE:
-    {chr(10).join([f"- {analysis.get('original', '')} → {analysis.get('correction', analysis.get('suggestion', ''))}: {analysis.get('reason', '')}" for analysis in session_data.get('word_analysis', {}).values()])}
-
-    GUIDELINES:
-    - Be encouraging but honest about areas for improvement
-    - Reference specific examples from their performance when possible
-    - Provide actionable, practical advice
-    - Keep responses concise (2-3 paragraphs max)
-    - Use a friendly, professional tone
-
+    context_prompt = f"""{context}{_CHAT_PROMPT_GUIDELINES}
     Student's question: "{user_message}"
 
     Response:"""
 
+    # Don't hold a pooled connection for the length of the OpenRouter call
+    db.session.close()
+
     try:
         # Call OpenRouter API (same as analysis endpoint)
-        response = requests.post(
+        response = _openrouter.post(
             url=OPENROUTER_API_URL,
-            headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"},
             json={
                 "model": AI_MODEL,
                 "messages": [{"role": "user", "content": context_prompt}],
@@ -421,10 +601,10 @@ def chat_with_session_data(user_id, session_usage_id):
         )
 
         if not response.ok:
-            print(f"CHAT_ERROR: OpenRouter API error: {response.status_code} - {response.text}")
+            logger.error("CHAT_ERROR: OpenRouter API error: %s - %s", response.status_code, response.text)
             return jsonify({"error": "Failed to get AI response"}), 500
 
-        ai_response = response.json()['choices'][0]['message']['content']
+        ai_response = orjson.loads(response.content)['choices'][0]['message']['content']
 
         return jsonify({
             "response": ai_response,
@@ -432,45 +612,33 @@ def chat_with_session_data(user_id, session_usage_id):
         })
 
     except Exception as e:
-        print(f"CHAT_ERROR: {str(e)}")
+        logger.exception("CHAT_ERROR: %s", e)
         return jsonify({"error": "Failed to process chat request"}), 500
 
 @app.route('/api/analytics/summary', methods=['GET'])
+@cache_control(30)
 def handle_platform_summary(): return get_platform_summary()
 
 @app.route('/api/analytics/popular', methods=['GET'])
+@cache_control(60)
 def handle_popular_sessions(): return get_popular_sessions()
 
-import os
-import requests
-from flask import abort
-
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHANNEL_USERNAME = os.getenv("TELEGRAM_CHANNEL_USERNAME")
-
-if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHANNEL_USERNAME:
-    print("WARNING: Telegram bot token or channel username not set in environment variables.")
-
-# Remove duplicate route definition to fix AssertionError
-# The function check_telegram_subscription_endpoint is already defined above
-
-# If there is a duplicate definition below, remove or comment it out
-
-# @app.route('/api/check_telegram_subscription', methods=['GET'])
-# @login_required
-# def check_telegram_subscription_endpoint(user_id):
-#     # duplicate function removed to avoid conflict
-
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHANNEL_USERNAME = os.getenv("TELEGRAM_CHANNEL_USERNAME")
-
-if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHANNEL_USERNAME:
+_TELEGRAM_OK = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHANNEL_USERNAME)
+_telegram = _http_session()
+# Telegram API endpoint to get chat member status
+_TELEGRAM_MEMBER_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getChatMember"
+# Chat member statuses that count as subscribed
+_SUBSCRIBED_STATUSES = frozenset(("member", "creator", "administrator"))
+
+if not _TELEGRAM_OK:
     print("WARNING: Telegram bot token or channel username not set in environment variables.")
 
 @app.route('/api/check_telegram_subscription', methods=['GET'])
 @login_required
 def check_telegram_subscription_endpoint(user_id):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHANNEL_USERNAME:
+    if not _TELEGRAM_OK:
         return {"error": "Telegram bot token or channel username not configured."}, 500
 
     # Get Telegram user ID from query parameter or user profile (for demo, assume user_id maps to telegram_user_id)
@@ -478,30 +646,26 @@ def check_telegram_subscription_endpoint(user_id):
     if not telegram_user_id:
         return {"error": "Missing telegram_user_id parameter."}, 400
 
-    # Telegram API endpoint to get chat member status
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getChatMember"
     params = {
         "chat_id": TELEGRAM_CHANNEL_USERNAME,
         "user_id": telegram_user_id
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = _telegram.get(_TELEGRAM_MEMBER_URL, params=params, timeout=10)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
         if not data.get("ok"):
             return {"subscribed": False}
 
         status = data.get("result", {}).get("status", "")
-        # Consider these statuses as subscribed
-        subscribed_statuses = ["member", "creator", "administrator"]
-        is_subscribed = status in subscribed_statuses
+        is_subscribed = status in _SUBSCRIBED_STATUSES
 
         return {"subscribed": is_subscribed}
 
-    except requests.RequestException as e:
-        print(f"Error checking Telegram subscription: {e}")
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
+        logger.error("Error checking Telegram subscription: %s", e)
         return {"error": "Failed to check subscription status."}, 500
 
 # Add health check endpoint for Railway
@@ -509,12 +673,7 @@ def check_telegram_subscription_endpoint(user_id):
 def health_check():
     return jsonify({"status": "healthy", "service": "spiko-backend"}), 200
 
-# Add these routes before the final if __name__ == '__main__' block
-
 # Serve frontend files
-import os
-from flask import send_from_directory
-
 # Configure Flask to serve static files from frontend directory
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend')
 
@@ -563,7 +722,3 @@ def serve_history():
     if os.path.isfile(history_path):
         return send_from_directory(os.path.join(FRONTEND_DIR, 'history'), 'index.html')
     return send_from_directory(FRONTEND_DIR, 'index.html')
-
-if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
-
@@ -1,10 +1,39 @@
 from flask import Blueprint, request, jsonify
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import os
 import ipaddress
+from threading import Lock
+from cachetools import TTLCache
 
 geo_bp = Blueprint('geo', __name__)
 
+# Optional local MaxMind GeoLite2-Country database. When GEOIP_MMDB_PATH points
+# at the .mmdb file, lookups are in-process reads of the memory-mapped file and
+# ipapi.co is only asked about IPs the database doesn't cover.
+_geoip_db = None
+_GEOIP_MMDB_PATH = os.getenv('GEOIP_MMDB_PATH')
+if _GEOIP_MMDB_PATH:
+    try:
+        import maxminddb
+        _geoip_db = maxminddb.open_database(_GEOIP_MMDB_PATH, maxminddb.MODE_MMAP)
+    except Exception as e:
+        print(f"WARNING: Could not open GeoIP database {_GEOIP_MMDB_PATH}: {e}")
+
+# Country codes resolved via ipapi.co, by IP. Country assignments rarely
+# change, so repeat visitors skip the external lookup for an hour.
+_country_cache = TTLCache(maxsize=100_000, ttl=3600)
+_country_cache_lock = Lock()
+
+# Keep-alive connections to ipapi.co, shared by all request threads
+_ipapi = requests.Session()
+_ipapi.mount('https://', HTTPAdapter(
+    pool_connections=1, pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+))
+
 def get_client_ip(req):
     """
     Extract the best-guess client IP.
@@ -30,7 +59,8 @@ def get_country_code(req, ip):
     Resolve ISO alpha-2 country code for the request.
     Priority:
     1) CDN headers (Cloudflare etc.)
-    2) Fallback to ipapi.co lookup by IP
+    2) Local GeoLite2 database, if configured
+    3) Fallback to ipapi.co lookup by IP
     Returns uppercase 2-letter code or '' if unknown.
     """
     # 1) CDN/Proxy headers
@@ -45,28 +75,54 @@ def get_country_code(req, ip):
         if v and len(v) == 2:
             return v.upper()
 
-    # 2) Fallback to external API
     if not ip:
         return ''
 
+    # 2) Local database
+    if _geoip_db is not None:
+        try:
+            record = _geoip_db.get(ip) or {}
+        except ValueError:
+            record = {}
+        code = ((record.get('country') or {}).get('iso_code') or '').upper()
+        if len(code) == 2:
+            return code
+
+    # 3) Fallback to external API
+    with _country_cache_lock:
+        code = _country_cache.get(ip)
+    if code:
+        return code
+
     try:
         # ipapi returns keys: country, country_name, country_code
-        r = requests.get(f'https://ipapi.co/{ip}/json/', timeout=5)
+        r = _ipapi.get(f'https://ipapi.co/{ip}/json/', timeout=5)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
         code = (data.get('country_code') or data.get('country') or '').upper().strip()
         if len(code) == 2:
+            with _country_cache_lock:
+                _country_cache[ip] = code
             return code
         return ''
-    except requests.RequestException:
+    except (requests.RequestException, orjson.JSONDecodeError):
         return ''
 
+def _geo_response(payload):
+    """
+    JSON response the browser may reuse for 5 minutes. The answer depends on
+    the client's IP, so it is private: shared caches must not serve it to others.
+    """
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
 @geo_bp.route('/api/check_uzbek_user', methods=['GET'])
 def check_uzbek_user():
     # Dev override
     dev_override = os.getenv('DEV_UZBEK_OVERRIDE', '').lower()
     if dev_override == 'true':
-        return jsonify({"is_uzbek": True, "source": "dev_override"})
+        return _geo_response({"is_uzbek": True, "source": "dev_override"})
 
     # Get client IP
     ip = get_client_ip(request)
@@ -80,17 +136,17 @@ def check_uzbek_user():
             is_private = True
     if not ip or is_private:
         # In dev or behind NAT without headers, default to free to avoid blocking UZ
-        return jsonify({"is_uzbek": True, "source": "private_or_unknown_ip"})
+        return _geo_response({"is_uzbek": True, "source": "private_or_unknown_ip"})
 
     # Resolve country
     cc = get_country_code(request, ip)
 
     # If unknown country, choose safe default: free
     if not cc or cc in ('ZZ', '--'):
-        return jsonify({"is_uzbek": True, "source": "unknown_country"})
+        return _geo_response({"is_uzbek": True, "source": "unknown_country"})
 
     is_uzbek = (cc == 'UZ')
-    return jsonify({
+    return _geo_response({
         "is_uzbek": is_uzbek,
         "country_code": cc,
         "ip": ip,
@@ -0,0 +1,43 @@
+# ==============================================================================
+# Spiko - Gunicorn Configuration
+#
+# Picked up automatically by `gunicorn flask_app:app` (Procfile / render.yaml).
+# The API spends most of its time waiting on OpenRouter, Telegram and ipapi,
+# so each worker runs a thread pool: a thread blocked on a slow LLM call
+# releases the GIL and the other threads keep serving requests.
+# ==============================================================================
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Processes x threads = requests in flight per instance
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+
+# /api/analyze waits up to 90s on OpenRouter; the default 30s would kill the worker
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master, not per worker
+preload_app = True
+
+
+def on_starting(server):
+    # Create/upgrade/seed the database once per instance, before any worker forks
+    from flask_app import app, init_database
+    from models import db
+    with app.app_context():
+        init_database()
+        # The master serves no requests; close its connections before forking
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading must not be shared across processes
+    from flask_app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -7,8 +7,12 @@
 # ==============================================================================
 
 import datetime
+import logging
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
 
 # --- Initialize Extensions ---
 # Define the extension objects here, but they will be initialized
@@ -16,6 +20,18 @@ from flask_bcrypt import Bcrypt
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
+logger = logging.getLogger(__name__)
+
+
+def hash_password(password):
+    """
+    Hashes a password with bcrypt at BCRYPT_LOG_ROUNDS. The bcrypt core releases
+    the GIL while hashing, so under the threaded gunicorn workers the other
+    request threads keep running meanwhile.
+    """
+    return bcrypt.generate_password_hash(password).decode('utf-8')
+
+
 # ==============================================================================
 # --- Model Definitions ---
 # ==============================================================================
@@ -42,12 +58,29 @@ class User(db.Model):
     def __init__(self, username, email, password):
         self.username = username
         self.email = email
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.set_password(password)
+
+    def set_password(self, password):
+        """Stores a bcrypt hash of the password at the configured cost."""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Checks if the provided password matches the stored hash."""
         return bcrypt.check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self):
+        """Checks if the stored hash uses a different bcrypt cost than the app is configured for."""
+        # bcrypt hashes look like $2b$<cost>$<salt+hash>
+        cost = int(self.password_hash.split('$')[2])
+        configured = current_app.config['BCRYPT_LOG_ROUNDS']
+        # Deliberately `!=`, not `<`: BCRYPT_LOG_ROUNDS is the login throughput
+        # lever, so hashes above it (e.g. Flask-Bcrypt's default 12) are moved
+        # down to it too. Downgrades are logged so they can be audited.
+        if cost > configured:
+            logger.warning("Rehashing password for user %s down from bcrypt cost %d to %d",
+                           self.id, cost, configured)
+        return cost != configured
+
     def to_json(self):
         """Returns a JSON-safe representation of the user."""
         return {
@@ -64,6 +97,12 @@ class SessionUsage(db.Model):
     Tracks each time a user completes a speaking session.
     """
     __tablename__ = 'session_usage'
+    __table_args__ = (
+        # Per-user history ordered by date is an index range scan, no sort
+        db.Index('ix_sessionusage_user_date', 'user_id', 'date'),
+        # Supports the GROUP BY in the popular sessions query
+        db.Index('ix_sessionusage_session_id_str', 'session_id_str'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -82,11 +121,63 @@ class FeedbackSummary(db.Model):
     Stores the detailed AI feedback for a specific session usage.
     """
     __tablename__ = 'feedback_summary'
+    __table_args__ = (
+        # Every session -> feedback join and the account deletion look up by this FK
+        db.Index('ix_feedbacksummary_session_usage_id', 'session_usage_id'),
+        # Score filters, and the startup backfill's "overall_score IS NULL" scan
+        db.Index('ix_feedbacksummary_overall_score', 'overall_score'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_usage_id = db.Column(db.Integer, db.ForeignKey('session_usage.id'), nullable=False)
     
-    # Store complex data like band scores as JSON strings in the database.
-    band_scores = db.Column(db.Text, nullable=False) # Stores JSON string of scores
-    feedback_text = db.Column(db.Text) # Stores JSON string of actionable insights
-    date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    # Store complex data like band scores as native JSON (JSONB on PostgreSQL),
+    # so the driver hands back Python dicts without a json.loads per read.
+    band_scores = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False) # Scores dict
+    feedback_text = db.Column(db.JSON().with_variant(JSONB(), 'postgresql')) # Actionable insights dict
+    date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    # Typed copies of the scores inside band_scores, so list views like the
+    # progress chart can read them without parsing the JSON.
+    overall_score = db.Column(db.Float)
+    fluency_coherence = db.Column(db.Float)
+    lexical_resource = db.Column(db.Float)
+    grammatical_range_accuracy = db.Column(db.Float)
+    pronunciation = db.Column(db.Float)
+
+
+# ==============================================================================
+# --- Schema Upgrades ---
+# ==============================================================================
+
+def upgrade_schema():
+    """
+    Brings an existing database up to date with the models above.
+    db.create_all() only creates missing tables, so columns added to a table
+    that already exists are added here. New columns must be nullable.
+    On PostgreSQL, JSON columns that were created as TEXT are converted to JSONB.
+    Indexes declared on the models are created if they don't exist yet.
+    """
+    dialect = db.engine.dialect
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column['name']: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            column_type = column.type.compile(dialect=dialect)
+            if column.name not in existing_columns:
+                db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            elif dialect.name == 'postgresql' and column_type == 'JSONB':
+                existing_type = existing_columns[column.name]['type'].compile(dialect=dialect)
+                if existing_type != 'JSONB':
+                    db.session.execute(text(
+                        f'ALTER TABLE {table.name} ALTER COLUMN {column.name} '
+                        f'TYPE JSONB USING {column.name}::jsonb'
+                    ))
+
+        for index in table.indexes:
+            index.create(bind=db.session.connection(), checkfirst=True)
+
+    db.session.commit()
\ No newline at end of file
@@ -5,24 +5,19 @@ This script converts the Flask backend to work with Supabase Edge Functions
 """
 
 import os
-import json
-import shutil
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # Supabase project configuration
 SUPABASE_PROJECT_ID = "qxaflkmpeavucazxqzmu"
 SUPABASE_URL = f"https://{SUPABASE_PROJECT_ID}.supabase.co"
 SUPABASE_ANON_KEY = "your-anon-key-here"  # Will be updated after deployment
 
-def create_supabase_function():
-    """Create the main Edge Function for the Flask backend"""
-    
-    # Create the Edge Function directory structure
-    functions_dir = Path("supabase/functions/spiko-api")
-    functions_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create the main function file
-    function_code = '''
+# Generated file contents, built and UTF-8 encoded once at import.
+# The create_* functions below only write them out, unbuffered, so each
+# file is a single write() call.
+
+# Edge Function source (supabase/functions/spiko-api/index.ts)
+_FUNCTION_CODE = '''
 import { serve } from "https://deno.land/std@0.168.0/http/server.ts"
 import { createClient } from 'https://esm.sh/@supabase/supabase-js@2'
 
@@ -31,6 +26,131 @@ const corsHeaders = {
   'Access-Control-Allow-Headers': 'authorization, x-client-info, apikey, content-type',
 }
 
+// Supabase clients, created once per isolate and reused by every request.
+// Nothing is persisted or refreshed: the isolate must never carry a user's session.
+const supabaseUrl = Deno.env.get('PROJECT_URL')!
+const supabaseKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!
+const clientOptions = { auth: { persistSession: false, autoRefreshToken: false, detectSessionInUrl: false } }
+// Service-role client for table access and token checks
+const supabase = createClient(supabaseUrl, supabaseKey, clientOptions)
+// Separate client for sign-in/sign-up: those keep the signed-in session in
+// memory, which must not replace the service role on the shared client
+const authClient = createClient(supabaseUrl, supabaseKey, clientOptions)
+
+// Headers for every JSON response, built once instead of spread per response
+const JSON_HEADERS = { ...corsHeaders, 'Content-Type': 'application/json' }
+
+// Static session data (from session-data folder), built once per isolate
+const SESSIONS_LIST = Object.freeze([
+  { id: "session_1", title: "Personal Information & Hobbies", keywords: "Family, hobbies, daily routine" },
+  { id: "session_2", title: "Work & Study", keywords: "Jobs, career, education, university" },
+  { id: "session_3", title: "Technology & The Internet", keywords: "Smartphones, social media, AI, online" }
+])
+
+const SESSIONS = new Map<string, object>([
+  ["session_1", {
+    "session_id": "session_1",
+    "title": "Personal Information & Hobbies",
+    "keywords": "Family, hobbies, daily routine",
+    "part1": ["Tell me about your family.", "What do you do in your free time?"],
+    "part2": {
+      "cue_card_topic": "Describe a hobby you enjoy.",
+      "cue_card_points": ["You should say:", "what the hobby is", "when you started it", "why you enjoy it"]
+    },
+    "part3": ["How important are hobbies in people's lives?", "Do you think hobbies change as people get older?"]
+  }]
+])
+
+// Pathname of the request. req.url is already a normalized absolute URL, so
+// slicing it gives the same result as new URL(req.url).pathname without a parse.
+function getPath(req: Request) {
+  const url = req.url
+  const start = url.indexOf('/', url.indexOf('//') + 2)
+  const query = url.indexOf('?', start)
+  return query < 0 ? url.slice(start) : url.slice(start, query)
+}
+
+const OPENROUTER_URL = 'https://openrouter.ai/api/v1/chat/completions'
+const ENCODER = new TextEncoder()
+
+// Users resolved from bearer tokens, so repeat calls skip the Auth round-trip.
+// Entries live for a minute, or until the token expires if that is sooner;
+// the oldest is evicted once the map is full.
+const AUTH_CACHE = new Map<string, { user: any, exp: number }>()
+const AUTH_TTL_MS = 60_000
+const AUTH_CACHE_SIZE = 1024
+
+// The exp claim of a JWT in milliseconds, or 0 if it can't be read.
+// Only used to bound caching; getUser() still verifies the token.
+function tokenExpiry(token: string) {
+  try {
+    const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')
+    return Number(JSON.parse(atob(payload)).exp) * 1000 || 0
+  } catch {
+    return 0
+  }
+}
+
+async function getUserForToken(token: string) {
+  const now = Date.now()
+  const hit = AUTH_CACHE.get(token)
+  if (hit && hit.exp > now) return hit.user
+
+  const { data, error } = await supabase.auth.getUser(token)
+  if (error) return null
+
+  // Tokens that are already expired, or have no readable exp, are not cached
+  const exp = Math.min(now + AUTH_TTL_MS, tokenExpiry(token))
+  AUTH_CACHE.delete(token)
+  if (exp > now) {
+    AUTH_CACHE.set(token, { user: data.user, exp })
+    if (AUTH_CACHE.size > AUTH_CACHE_SIZE) {
+      AUTH_CACHE.delete(AUTH_CACHE.keys().next().value)
+    }
+  }
+  return data.user
+}
+
+// Analyses by transcript hash. The pending promise is stored, so concurrent
+// requests for the same transcript share one OpenRouter call.
+const ANALYSIS_CACHE = new Map<string, { value: Promise<any>, exp: number }>()
+const ANALYSIS_TTL_MS = 10 * 60_000
+const ANALYSIS_CACHE_SIZE = 256
+
+async function analyzeTranscript(transcript: string, apiKey: string) {
+  const key = await hashText(transcript)
+  const now = Date.now()
+  const hit = ANALYSIS_CACHE.get(key)
+  if (hit && hit.exp > now) return hit.value
+
+  const value = performAIAnalysis(transcript, apiKey, key)
+  ANALYSIS_CACHE.delete(key)
+  ANALYSIS_CACHE.set(key, { value, exp: now + ANALYSIS_TTL_MS })
+  if (ANALYSIS_CACHE.size > ANALYSIS_CACHE_SIZE) {
+    ANALYSIS_CACHE.delete(ANALYSIS_CACHE.keys().next().value)
+  }
+  // Failures are not cached; the next request retries
+  value.catch(() => {
+    if (ANALYSIS_CACHE.get(key)?.value === value) ANALYSIS_CACHE.delete(key)
+  })
+  return value
+}
+
+// One decoder for all request bodies instead of one per req.json() call
+const DECODER = new TextDecoder()
+
+async function readJson(req: Request) {
+  return JSON.parse(DECODER.decode(new Uint8Array(await req.arrayBuffer())))
+}
+
+// Exact "METHOD /path" routes
+const ROUTES = new Map<string, (req: Request) => Promise<Response>>([
+  ['POST /api/login', handleLogin],
+  ['POST /api/register', handleRegister],
+  ['GET /api/me', handleGetUser],
+  ['POST /api/analyze', handleAnalyze],
+])
+
 serve(async (req) => {
   // Handle CORS preflight requests
   if (req.method === 'OPTIONS') {
@@ -38,26 +158,15 @@ serve(async (req) => {
   }
 
   try {
-    const url = new URL(req.url)
-    const path = url.pathname
+    const path = getPath(req)
     const method = req.method
 
-    // Initialize Supabase client
-    const supabaseUrl = Deno.env.get('PROJECT_URL')!
-    const supabaseKey = Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!
-    const supabase = createClient(supabaseUrl, supabaseKey)
-
-    // Route handling
-    if (path === '/api/login' && method === 'POST') {
-      return await handleLogin(req, supabase)
-    } else if (path === '/api/register' && method === 'POST') {
-      return await handleRegister(req, supabase)
-    } else if (path === '/api/me' && method === 'GET') {
-      return await handleGetUser(req, supabase)
-    } else if (path === '/api/analyze' && method === 'POST') {
-      return await handleAnalyze(req, supabase)
+    // Route handling: one map lookup for the exact routes, then the sessions prefix
+    const handler = ROUTES.get(method + ' ' + path)
+    if (handler) {
+      return await handler(req)
     } else if (path.startsWith('/api/sessions')) {
-      return await handleSessions(req, supabase)
+      return await handleSessions(req)
     } else {
       return new Response('Not Found', { status: 404, headers: corsHeaders })
     }
@@ -66,16 +175,16 @@ serve(async (req) => {
     console.error('Error:', error)
     return new Response(JSON.stringify({ error: 'Internal Server Error' }), {
       status: 500,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 })
 
-async function handleLogin(req: Request, supabase: any) {
-  const { email, password } = await req.json()
+async function handleLogin(req: Request) {
+  const { email, password } = await readJson(req)
   
   // Authenticate user with Supabase Auth
-  const { data, error } = await supabase.auth.signInWithPassword({
+  const { data, error } = await authClient.auth.signInWithPassword({
     email,
     password
   })
@@ -83,7 +192,7 @@ async function handleLogin(req: Request, supabase: any) {
   if (error) {
     return new Response(JSON.stringify({ error: error.message }), {
       status: 401,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
@@ -92,15 +201,15 @@ async function handleLogin(req: Request, supabase: any) {
     token: data.session.access_token,
     user: data.user
   }), {
-    headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    headers: JSON_HEADERS
   })
 }
 
-async function handleRegister(req: Request, supabase: any) {
-  const { username, email, password } = await req.json()
+async function handleRegister(req: Request) {
+  const { username, email, password } = await readJson(req)
   
   // Create user with Supabase Auth
-  const { data, error } = await supabase.auth.signUp({
+  const { data, error } = await authClient.auth.signUp({
     email,
     password,
     options: {
@@ -113,7 +222,7 @@ async function handleRegister(req: Request, supabase: any) {
   if (error) {
     return new Response(JSON.stringify({ error: error.message }), {
       status: 400,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
@@ -121,26 +230,26 @@ async function handleRegister(req: Request, supabase: any) {
     message: 'User registered successfully!',
     user: data.user
   }), {
-    headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    headers: JSON_HEADERS
   })
 }
 
-async function handleGetUser(req: Request, supabase: any) {
+async function handleGetUser(req: Request) {
   const authHeader = req.headers.get('Authorization')
   if (!authHeader) {
     return new Response(JSON.stringify({ error: 'Missing authorization header' }), {
       status: 401,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
   const token = authHeader.replace('Bearer ', '')
-  const { data: { user }, error } = await supabase.auth.getUser(token)
+  const user = await getUserForToken(token)
 
-  if (error) {
+  if (!user) {
     return new Response(JSON.stringify({ error: 'Invalid token' }), {
       status: 401,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
@@ -150,159 +259,173 @@ async function handleGetUser(req: Request, supabase: any) {
     email: user.email,
     created_at: user.created_at
   }), {
-    headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    headers: JSON_HEADERS
   })
 }
 
-async function handleAnalyze(req: Request, supabase: any) {
+async function handleAnalyze(req: Request) {
   // Get user from token
   const authHeader = req.headers.get('Authorization')
   if (!authHeader) {
     return new Response(JSON.stringify({ error: 'Missing authorization header' }), {
       status: 401,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
   const token = authHeader.replace('Bearer ', '')
-  const { data: { user }, error: authError } = await supabase.auth.getUser(token)
+  const user = await getUserForToken(token)
 
-  if (authError) {
+  if (!user) {
     return new Response(JSON.stringify({ error: 'Invalid token' }), {
       status: 401,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
-  const { transcript, session_id, questions_and_answers } = await req.json()
+  const { transcript, session_id, questions_and_answers } = await readJson(req)
 
   // Call OpenRouter API for analysis
   const openrouterKey = Deno.env.get('OPENROUTER_API_KEY')
   if (!openrouterKey) {
     return new Response(JSON.stringify({ error: 'AI service not configured' }), {
       status: 500,
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+      headers: JSON_HEADERS
     })
   }
 
   // AI analysis logic here (similar to Flask backend)
-  const analysisResult = await performAIAnalysis(transcript, openrouterKey)
+  const analysisResult = await analyzeTranscript(transcript, openrouterKey)
   
   // Store results in database
   await storeAnalysisResults(supabase, user.id, session_id, analysisResult, transcript, questions_and_answers)
 
   return new Response(JSON.stringify(analysisResult), {
-    headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    headers: JSON_HEADERS
   })
 }
 
-async function handleSessions(req: Request, supabase: any) {
-  const url = new URL(req.url)
-  const pathParts = url.pathname.split('/')
-  
-  if (pathParts.length === 3) {
+async function handleSessions(req: Request) {
+  // Whatever follows "/api/sessions" (13 chars), read without splitting the path
+  const path = getPath(req)
+  const tail = path.length > 13 ? path.slice(13) : ''
+
+  if (tail === '' || tail === '/') {
     // GET /api/sessions - list all sessions
-    const sessions = await getSessionsList()
-    return new Response(JSON.stringify(sessions), {
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
-    })
-  } else if (pathParts.length === 4) {
-    // GET /api/sessions/:id - get specific session
-    const sessionId = pathParts[3]
-    const session = await getSessionById(sessionId)
-    return new Response(JSON.stringify(session), {
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    return new Response(JSON.stringify(SESSIONS_LIST), {
+      headers: JSON_HEADERS
     })
   }
+
+  // GET /api/sessions/:id - get specific session
+  const sessionId = tail[0] === '/' ? tail.slice(1) : tail
+  return new Response(JSON.stringify(SESSIONS.get(sessionId) ?? null), {
+    headers: JSON_HEADERS
+  })
+}
+
+// Hex SHA-1 of a string, used to identify a transcript
+async function hashText(text: string) {
+  const digest = new Uint8Array(await crypto.subtle.digest('SHA-1', ENCODER.encode(text)))
+  let hex = ''
+  for (let i = 0; i < digest.length; i++) hex += digest[i].toString(16).padStart(2, '0')
+  return hex
+}
+
+// Retries network errors, 429s and 5xx responses with exponential backoff and
+// jitter, waiting for Retry-After (capped) when the upstream sends one
+async function fetchWithBackoff(url: string, init: RequestInit, attempts = 4) {
+  let delay = 100
+  for (let i = 1; ; i++) {
+    let response: Response | null = null
+    try {
+      response = await fetch(url, init)
+      if (response.status !== 429 && response.status < 500) return response
+    } catch (error) {
+      if (i >= attempts) throw error
+    }
+    if (i >= attempts) throw new Error('upstream_unavailable')
+
+    const retryAfter = Number(response?.headers.get('Retry-After')) * 1000
+    await response?.body?.cancel()
+    await new Promise((resolve) => setTimeout(resolve, Math.min(retryAfter || delay, 10_000) + Math.random() * 50))
+    delay *= 2
+  }
 }
 
-async function performAIAnalysis(transcript: string, apiKey: string) {
+async function performAIAnalysis(transcript: string, apiKey: string, transcriptHash: string) {
   // Implementation of AI analysis (similar to Flask backend)
   const prompt = `You are an expert IELTS Speaking examiner...` // Full prompt here
   
-  const response = await fetch('https://openrouter.ai/api/v1/chat/completions', {
+  const body = ENCODER.encode(JSON.stringify({
+    model: 'mistralai/mistral-7b-instruct:free',
+    messages: [{ role: 'user', content: prompt }]
+  }))
+
+  // Deno pools connections per isolate; ask for a compressed completion too
+  const response = await fetchWithBackoff(OPENROUTER_URL, {
     method: 'POST',
     headers: {
       'Authorization': `Bearer ${apiKey}`,
-      'Content-Type': 'application/json'
+      'Content-Type': 'application/json',
+      'Accept-Encoding': 'gzip',
+      // Lets the upstream recognise a retried request for the same transcript
+      'Idempotency-Key': transcriptHash
     },
-    body: JSON.stringify({
-      model: 'mistralai/mistral-7b-instruct:free',
-      messages: [{ role: 'user', content: prompt }]
-    })
+    body
   })
 
   const result = await response.json()
-  return JSON.parse(result.choices[0].message.content)
+  return extractJson(result.choices[0].message.content)
 }
 
-async function storeAnalysisResults(supabase: any, userId: string, sessionId: string, analysis: any, transcript: string, qa: any[]) {
-  // Store session usage
-  const { data: sessionUsage } = await supabase
-    .from('session_usage')
-    .insert({
-      user_id: userId,
-      session_id_str: sessionId,
-      duration: 300, // Default duration
-      words_spoken: transcript.split(' ').length
-    })
-    .select()
-    .single()
-
-  // Store feedback summary
-  await supabase
-    .from('feedback_summary')
-    .insert({
-      session_usage_id: sessionUsage.id,
-      band_scores: JSON.stringify(analysis.criteria_scores),
-      feedback_text: JSON.stringify(analysis.actionable_insights)
-    })
+// Parses the outermost {...} of a model reply, so prose around the JSON
+// doesn't fail an otherwise good analysis
+function extractJson(content: string) {
+  const start = content.indexOf('{')
+  const end = content.lastIndexOf('}')
+  if (start < 0 || end < start) throw new Error('no_json')
+
+  const analysis = JSON.parse(content.slice(start, end + 1))
+  if (!isObject(analysis) || !isObject(analysis.criteria_scores) || !isObject(analysis.actionable_insights)) {
+    throw new Error('invalid_analysis')
+  }
+  return analysis
 }
 
-async function getSessionsList() {
-  // Return static session data (from session-data folder)
-  return [
-    { id: "session_1", title: "Personal Information & Hobbies", keywords: "Family, hobbies, daily routine" },
-    { id: "session_2", title: "Work & Study", keywords: "Jobs, career, education, university" },
-    { id: "session_3", title: "Technology & The Internet", keywords: "Smartphones, social media, AI, online" }
-  ]
+// typeof alone lets null and arrays through
+function isObject(value: unknown) {
+  return typeof value === 'object' && value !== null && !Array.isArray(value)
 }
 
-async function getSessionById(sessionId: string) {
-  // Return specific session data
-  const sessions = {
-    "session_1": {
-      "session_id": "session_1",
-      "title": "Personal Information & Hobbies",
-      "keywords": "Family, hobbies, daily routine",
-      "part1": ["Tell me about your family.", "What do you do in your free time?"],
-      "part2": {
-        "cue_card_topic": "Describe a hobby you enjoy.",
-        "cue_card_points": ["You should say:", "what the hobby is", "when you started it", "why you enjoy it"]
-      },
-      "part3": ["How important are hobbies in people's lives?", "Do you think hobbies change as people get older?"]
-    }
+function countWords(text: string) {
+  // Counts whitespace-separated words in one pass, without building an array
+  let words = 0
+  let inWord = false
+  for (let i = 0, n = text.length; i < n; i++) {
+    const c = text.charCodeAt(i)
+    const isSpace = c === 32 || (c >= 9 && c <= 13)
+    if (!isSpace && !inWord) words++
+    inWord = !isSpace
   }
-  
-  return sessions[sessionId] || null
+  return words
 }
-'''
 
-    # Write the function file
-    with open(functions_dir / "index.ts", "w") as f:
-        f.write(function_code)
-    
-    print(f"✅ Created Edge Function at {functions_dir}/index.ts")
+async function storeAnalysisResults(supabase: any, userId: string, sessionId: string, analysis: any, transcript: string, qa: any[]) {
+  // Both rows are inserted by one Postgres function: a single round-trip and transaction
+  await supabase.rpc('store_analysis', {
+    p_user: userId,
+    p_session: sessionId,
+    p_duration: 300, // Default duration
+    p_words: countWords(transcript),
+    p_scores: analysis.criteria_scores,
+    p_feedback: analysis.actionable_insights
+  })
+}
+'''.encode('utf-8')
 
-def create_supabase_config():
-    """Create Supabase configuration files"""
-    
-    # Create supabase directory
-    supabase_dir = Path("supabase")
-    supabase_dir.mkdir(exist_ok=True)
-    
-    # Create config.toml
-    config_content = f'''[api]
+# Local Supabase configuration (supabase/config.toml)
+_CONFIG_CONTENT = '''[api]
 enabled = true
 port = 54321
 schemas = ["public", "graphql_public"]
@@ -324,6 +447,13 @@ enable_confirmations = false
 [db]
 port = 54322
 
+[db.pooler]
+enabled = true
+port = 54329
+pool_mode = "transaction"
+default_pool_size = 20
+max_client_conn = 200
+
 [studio]
 enabled = true
 port = 54323
@@ -341,17 +471,10 @@ enabled = true
 
 [analytics]
 enabled = false
-'''
-    
-    with open(supabase_dir / "config.toml", "w") as f:
-        f.write(config_content)
-    
-    print("✅ Created Supabase config.toml")
+'''.encode('utf-8')
 
-def create_deployment_instructions():
-    """Create deployment instructions"""
-    
-    instructions = f'''# Spiko Backend Deployment to Supabase
+# Deployment guide (SUPABASE_DEPLOYMENT.md)
+_INSTRUCTIONS = f'''# Spiko Backend Deployment to Supabase
 
 ## Project Information
 - **Project ID**: {SUPABASE_PROJECT_ID}
@@ -377,8 +500,17 @@ supabase link --project-ref {SUPABASE_PROJECT_ID}
 
 ### 4. Deploy Edge Functions
 ```bash
-supabase functions deploy spiko-api
+# Resolve and type-check the function's remote imports before deploying
+export DENO_DIR=./.deno_cache
+deno cache supabase/functions/spiko-api/index.ts
+supabase functions deploy spiko-api --no-verify-jwt
 ```
+Keeping `.deno_cache` between CI runs lets `deno cache` skip re-downloading and
+re-checking unchanged imports. The function itself is bundled at deploy time,
+so the hosted runtime does not read this cache.
+
+`--no-verify-jwt` lets `/api/login` and `/api/register` be called without a
+Supabase token; the function verifies tokens itself on the protected routes.
 
 ### 5. Set Environment Variables
 ```bash
@@ -398,6 +530,36 @@ The following tables have been created:
 - `session_usage` - Session tracking
 - `feedback_summary` - AI feedback storage
 
+Analysis results are written by the `store_analysis` function, which inserts the
+`session_usage` and `feedback_summary` rows in one round-trip and transaction.
+Create it once in the SQL editor:
+```sql
+create or replace function store_analysis(
+  p_user uuid, p_session text, p_duration int, p_words int, p_scores jsonb, p_feedback jsonb
+) returns void language sql as $$
+  with s as (
+    insert into session_usage (user_id, session_id_str, duration, words_spoken)
+    values (p_user, p_session, p_duration, p_words)
+    returning id
+  )
+  insert into feedback_summary (session_usage_id, band_scores, feedback_text)
+  select id, p_scores, p_feedback from s;
+$$;
+```
+
+`band_scores` and `feedback_text` hold the analysis objects as `jsonb`. If they
+were created as `text`, convert them first:
+```sql
+alter table feedback_summary
+  alter column band_scores type jsonb using band_scores::jsonb,
+  alter column feedback_text type jsonb using feedback_text::jsonb;
+```
+
+Direct Postgres clients (such as the Flask backend's `DATABASE_URL`) should use
+the pooled connection string, `…pooler.supabase.com:6543`. Transaction pool mode
+fits short, stateless queries and avoids opening a new connection per request. The Edge Function goes
+through the REST API, so it does not need it.
+
 ## API Endpoints
 All Flask routes are now available at:
 - `{SUPABASE_URL}/functions/v1/spiko-api/api/login`
@@ -415,19 +577,50 @@ Users will authenticate through Supabase's built-in authentication system.
 2. Update frontend API URLs
 3. Test all endpoints
 4. Configure custom domain (optional)
-'''
+'''.encode('utf-8')
+
+
+def create_supabase_function():
+    """Create the main Edge Function for the Flask backend"""
+    
+    # Create the Edge Function directory structure
+    functions_path = "supabase/functions/spiko-api"
+    os.makedirs(functions_path, exist_ok=True)
+    
+    # Write the function file
+    with open(functions_path + "/index.ts", "wb", buffering=0) as f:
+        f.write(_FUNCTION_CODE)
+    
+    print(f"✅ Created Edge Function at {functions_path}/index.ts")
+
+def create_supabase_config():
+    """Create Supabase configuration files"""
+    
+    # Create supabase directory
+    os.makedirs("supabase", exist_ok=True)
+    
+    # Create config.toml
+    with open("supabase/config.toml", "wb", buffering=0) as f:
+        f.write(_CONFIG_CONTENT)
+    
+    print("✅ Created Supabase config.toml")
+
+def create_deployment_instructions():
+    """Create deployment instructions"""
     
-    with open("SUPABASE_DEPLOYMENT.md", "w") as f:
-        f.write(instructions)
+    with open("SUPABASE_DEPLOYMENT.md", "wb", buffering=0) as f:
+        f.write(_INSTRUCTIONS)
     
     print("✅ Created deployment instructions: SUPABASE_DEPLOYMENT.md")
 
 if __name__ == "__main__":
     print("🚀 Starting Supabase deployment setup...")
     
-    create_supabase_function()
-    create_supabase_config()
-    create_deployment_instructions()
+    # The three files are independent, so write them concurrently;
+    # map() re-raises the first error from any of them
+    steps = (create_supabase_function, create_supabase_config, create_deployment_instructions)
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        list(executor.map(lambda step: step(), steps))
     
     print("\n✅ Supabase deployment setup complete!")
     print(f"📁 Project ID: {SUPABASE_PROJECT_ID}")